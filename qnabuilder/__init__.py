@@ -8,13 +8,26 @@ __author__ = "Mehdi Samsami"
 
 __all__ = (
     "QnABot",
+    "ShardedQnABot",
     "EmbeddingModel",
     "SimilarityMetric",
+    "NormalizationRule",
+    "ShardBackend",
+    "MemoryBudgetAction",
+    "MemoryBudgetExceededError",
     "QnAKnowledgeBase",
     "DEFAULT_KNOWLEDGE_BASE_FILE_PATH",
 )
 
 
 from .qna_bot import QnABot
-from ._enums import EmbeddingModel, SimilarityMetric
+from .sharded import ShardedQnABot
+from ._enums import (
+    EmbeddingModel,
+    SimilarityMetric,
+    NormalizationRule,
+    ShardBackend,
+    MemoryBudgetAction,
+)
+from ._exceptions import MemoryBudgetExceededError
 from .kb import QnAKnowledgeBase, DEFAULT_KNOWLEDGE_BASE_FILE_PATH
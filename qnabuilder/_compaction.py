@@ -0,0 +1,146 @@
+from typing import List, Optional, Tuple, TypedDict
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.preprocessing import normalize
+
+
+__all__ = ["CompactionReport", "compact_embeddings"]
+
+
+class RemovedRow(TypedDict):
+    row: int
+    kept_row: int
+    qna_id: int
+    kept_qna_id: int
+    similarity: float
+
+
+class CompactionReport(TypedDict):
+    n_rows: int
+    n_kept: int
+    removed: List[RemovedRow]
+    conflicting_groups: List[Tuple[int, int]]
+
+
+def _identical_rows(embeddings: csr_matrix) -> np.ndarray:
+    # Map every row to the first row with exactly the same non-zero entries
+    first_rows = {}
+    representative = np.arange(embeddings.shape[0])
+    for i in range(embeddings.shape[0]):
+        start, end = embeddings.indptr[i], embeddings.indptr[i + 1]
+        key = (
+            embeddings.indices[start:end].tobytes(),
+            embeddings.data[start:end].tobytes(),
+        )
+        representative[i] = first_rows.setdefault(key, i)
+    return representative
+
+
+def _near_duplicate_rows(
+    embeddings: csr_matrix, rows: np.ndarray, threshold: float, block_size: int = 2048
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Greedily map every row to the earliest kept row whose cosine similarity reaches the threshold. Similarities
+    # are computed one block of rows at a time against the later rows that are still kept, and entries below the
+    # threshold are dropped right away, so the all-pairs similarity matrix is never built.
+    normalized = normalize(embeddings[rows], norm="l2").tocsr()
+    n_rows = normalized.shape[0]
+
+    representative = np.arange(n_rows)
+    scores = np.ones(n_rows)
+    for block_start in range(0, n_rows, block_size):
+        block_end = min(block_start + block_size, n_rows)
+        columns = block_start + np.flatnonzero(
+            representative[block_start:] == np.arange(block_start, n_rows)
+        )
+        similarities = (
+            normalized[block_start:block_end] @ normalized[columns].T
+        ).tocsr()
+        similarities.data[similarities.data < threshold] = 0.0
+        similarities.eliminate_zeros()
+
+        for i in range(block_start, block_end):
+            if representative[i] != i:
+                continue
+            start, end = similarities.indptr[i - block_start], similarities.indptr[i - block_start + 1]
+            for j, score in zip(
+                columns[similarities.indices[start:end]], similarities.data[start:end]
+            ):
+                if j > i and representative[j] == j:
+                    representative[j] = i
+                    scores[j] = score
+    return representative, scores
+
+
+def compact_embeddings(
+    embeddings: csr_matrix,
+    ref_questions_idx: List[int],
+    threshold: Optional[float] = None,
+) -> Tuple[csr_matrix, np.ndarray, CompactionReport]:
+    """Collapses identical, and optionally near-duplicate, rows of a reference embedding matrix.
+
+    The first occurrence of each duplicated row is kept along with its QnA ID.
+
+    Args:
+        embeddings (csr_matrix): Embedding matrix of the reference questions.
+        ref_questions_idx (List[int]): QnA IDs of the reference questions.
+        threshold (Optional[float]): Cosine similarity at or above which two rows are considered near-duplicates.
+                                     If None, only identical rows are collapsed. Defaults to None.
+
+    Returns:
+        csr_matrix: Compacted embedding matrix.
+        np.ndarray: QnA IDs of the rows of the compacted embedding matrix.
+        CompactionReport: Report of the removed rows and of the QnA groups sharing duplicated rows.
+    """
+    if threshold is not None and not 0.0 < threshold <= 1.0:
+        raise ValueError(
+            f"{threshold} is not a valid compaction threshold. Must be in (0, 1]"
+        )
+
+    embeddings = csr_matrix(embeddings)
+    embeddings.sort_indices()
+    ref_questions_idx = np.asarray(ref_questions_idx)
+
+    representative = _identical_rows(embeddings)
+    scores = np.ones(embeddings.shape[0])
+
+    if threshold is not None:
+        identical_representative = representative.copy()
+        kept = np.flatnonzero(representative == np.arange(embeddings.shape[0]))
+        near_representative, near_scores = _near_duplicate_rows(
+            embeddings, kept, threshold
+        )
+        collapsed = near_representative != np.arange(len(kept))
+        representative[kept[collapsed]] = kept[near_representative[collapsed]]
+        scores[kept[collapsed]] = near_scores[collapsed]
+        # Rows identical to a collapsed row follow it to its representative
+        representative = representative[identical_representative]
+        scores = scores[identical_representative]
+
+    kept = np.flatnonzero(representative == np.arange(embeddings.shape[0]))
+    removed = np.flatnonzero(representative != np.arange(embeddings.shape[0]))
+
+    conflicting_groups = set()
+    removed_rows = []
+    for row in removed:
+        kept_row = int(representative[row])
+        qna_id, kept_qna_id = int(ref_questions_idx[row]), int(ref_questions_idx[kept_row])
+        if qna_id != kept_qna_id:
+            conflicting_groups.add((min(qna_id, kept_qna_id), max(qna_id, kept_qna_id)))
+        removed_rows.append(
+            RemovedRow(
+                row=int(row),
+                kept_row=kept_row,
+                qna_id=qna_id,
+                kept_qna_id=kept_qna_id,
+                similarity=float(scores[row]),
+            )
+        )
+
+    report = CompactionReport(
+        n_rows=embeddings.shape[0],
+        n_kept=len(kept),
+        removed=removed_rows,
+        conflicting_groups=sorted(conflicting_groups),
+    )
+    return embeddings[kept], ref_questions_idx[kept], report
@@ -1,7 +1,13 @@
 from enum import Enum
 
 
-__all__ = ["EmbeddingModel", "SimilarityMetric"]
+__all__ = [
+    "EmbeddingModel",
+    "SimilarityMetric",
+    "NormalizationRule",
+    "ShardBackend",
+    "MemoryBudgetAction",
+]
 
 
 class EmbeddingModel(str, Enum):
@@ -22,3 +28,31 @@ class SimilarityMetric(str, Enum):
     COSINE = "cosine"
     EUCLIDEAN = "euclidean"
     MANHATTAN = "manhattan"
+
+
+class NormalizationRule(str, Enum):
+    """
+    Names of text normalization rules applied before exact matching.
+    """
+
+    LOWERCASE = "lowercase"
+    WHITESPACE = "whitespace"
+    PUNCTUATION = "punctuation"
+
+
+class ShardBackend(str, Enum):
+    """
+    Names of backends serving the shards of a sharded QnA Bot.
+    """
+
+    LOCAL = "local"
+    PROCESS = "process"
+
+
+class MemoryBudgetAction(str, Enum):
+    """
+    Names of actions taken when fitting a QnA Bot exceeds its memory budget.
+    """
+
+    RAISE = "raise"
+    COMPACT = "compact"
@@ -0,0 +1,7 @@
+class MemoryBudgetExceededError(MemoryError):
+    """Exception class to raise in case a fitted QnA Bot would use more memory than its memory budget.
+
+    This class inherits from MemoryError to help with exception handling.
+    """
+
+    pass
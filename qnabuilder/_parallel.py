@@ -0,0 +1,251 @@
+import numbers
+from collections import Counter
+from typing import List, Tuple
+
+import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
+from scipy.sparse import csr_matrix, vstack
+
+from sklearn.feature_extraction.text import (
+    TfidfTransformer,
+    TfidfVectorizer,
+    HashingVectorizer,
+    CountVectorizer,
+)
+
+
+__all__ = [
+    "TermStatistics",
+    "validate_model_params",
+    "term_statistics",
+    "fit_term_statistics",
+    "parallel_fit_transform",
+]
+
+
+# Terms of a partition of the documents, their document and term frequencies, and the number of documents
+TermStatistics = Tuple[List[str], np.ndarray, np.ndarray, int]
+
+
+def _chunks(documents: list, n_chunks: int) -> List[list]:
+    size = -(-len(documents) // n_chunks)
+    return [documents[i : i + size] for i in range(0, len(documents), size)]
+
+
+def validate_model_params(model) -> None:
+    """Runs the parameter checks that the fit() method of a vectorizer starts with.
+
+    Fits that are split across processes do not call the vectorizer's fit(), so they must check its parameters first.
+
+    Args:
+        model: Unfitted TfidfVectorizer, HashingVectorizer, or CountVectorizer instance.
+
+    """
+    # Recent scikit-learn versions check ngram_range separately from the declared parameter constraints
+    model._validate_params()
+    if hasattr(model, "_validate_ngram_range"):
+        model._validate_ngram_range()
+    model._warn_for_unused_params()
+
+
+def _count_chunk(
+    model: CountVectorizer, documents: list
+) -> Tuple[List[str], csr_matrix]:
+    # Tokenize and count a chunk of documents against a local vocabulary
+    analyzer = model.build_analyzer()
+    vocabulary = {}
+
+    indices, values, indptr = [], [], [0]
+    for document in documents:
+        counts = Counter()
+        for term in analyzer(document):
+            counts[vocabulary.setdefault(term, len(vocabulary))] += 1
+        indices.extend(counts.keys())
+        values.extend(counts.values())
+        indptr.append(len(indices))
+
+    counts = csr_matrix(
+        (
+            np.asarray(values, dtype=np.int64),
+            np.asarray(indices, dtype=np.int64),
+            np.asarray(indptr, dtype=np.int64),
+        ),
+        shape=(len(documents), len(vocabulary)),
+    )
+    return list(vocabulary), counts
+
+
+def _merge_chunks(
+    chunks: List[Tuple[List[str], csr_matrix]]
+) -> Tuple[List[str], csr_matrix]:
+    # Merge the local vocabularies in sorted order, as CountVectorizer does, and remap the chunks' columns
+    terms = sorted(set().union(*(chunk_terms for chunk_terms, _ in chunks)))
+    vocabulary = {term: i for i, term in enumerate(terms)}
+
+    remapped = []
+    for chunk_terms, counts in chunks:
+        mapping = np.asarray([vocabulary[term] for term in chunk_terms], dtype=np.int64)
+        remapped.append(
+            csr_matrix(
+                (counts.data, mapping[counts.indices], counts.indptr),
+                shape=(counts.shape[0], len(terms)),
+            )
+        )
+    return terms, vstack(remapped, format="csr")
+
+
+def _limit_features(
+    model: CountVectorizer, dfs: np.ndarray, tfs: np.ndarray, n_docs: int
+) -> np.ndarray:
+    # Mask of the terms kept by max_df, min_df, and max_features, given their document and term frequencies
+    if len(dfs) == 0:
+        raise ValueError(
+            "empty vocabulary; perhaps the documents only contain stop words"
+        )
+    max_doc_count = (
+        model.max_df
+        if isinstance(model.max_df, numbers.Integral)
+        else model.max_df * n_docs
+    )
+    min_doc_count = (
+        model.min_df
+        if isinstance(model.min_df, numbers.Integral)
+        else model.min_df * n_docs
+    )
+    if max_doc_count < min_doc_count:
+        raise ValueError("max_df corresponds to < documents than min_df")
+
+    mask = (dfs <= max_doc_count) & (dfs >= min_doc_count)
+    if model.max_features is not None and mask.sum() > model.max_features:
+        mask_inds = (-tfs[mask]).argsort()[: model.max_features]
+        new_mask = np.zeros(len(dfs), dtype=bool)
+        new_mask[np.where(mask)[0][mask_inds]] = True
+        mask = new_mask
+
+    if not mask.any():
+        raise ValueError(
+            "After pruning, no terms remain. Try a lower min_df or a higher max_df."
+        )
+    return mask
+
+
+def _set_vocabulary(model: CountVectorizer, terms: List[str], mask: np.ndarray) -> None:
+    model.vocabulary_ = {
+        term: i for i, term in enumerate(term for term, kept in zip(terms, mask) if kept)
+    }
+    model.stop_words_ = {term for term, kept in zip(terms, mask) if not kept}
+    model.fixed_vocabulary_ = False
+
+
+def term_statistics(model: CountVectorizer, documents: list) -> TermStatistics:
+    """Counts the document and term frequencies of the terms of a partition of the documents.
+
+    Args:
+        model: Unfitted TfidfVectorizer or CountVectorizer instance.
+        documents (list): Documents of the partition.
+
+    Returns:
+        TermStatistics: Terms of the partition with their document and term frequencies, and the number of documents.
+    """
+    terms, counts = _count_chunk(model, documents)
+    dfs = np.bincount(counts.indices, minlength=len(terms))
+    tfs = np.asarray(counts.sum(axis=0)).ravel()
+    return terms, dfs, tfs, len(documents)
+
+
+def fit_term_statistics(model: CountVectorizer, statistics: List[TermStatistics]) -> None:
+    """Fits the vocabulary, and the IDF weights of a TF-IDF model, from the term statistics of all partitions.
+
+    The model must have no fixed vocabulary, and a TF-IDF model must use IDF weights.
+
+    Args:
+        model: Unfitted TfidfVectorizer or CountVectorizer instance.
+        statistics (List[TermStatistics]): Term statistics of the partitions, as returned by term_statistics().
+
+    """
+    terms = sorted(set().union(*(partition[0] for partition in statistics)))
+    vocabulary = {term: i for i, term in enumerate(terms)}
+    dfs = np.zeros(len(terms), dtype=np.int64)
+    tfs = np.zeros(len(terms), dtype=np.int64)
+    n_docs = 0
+    for partition_terms, partition_dfs, partition_tfs, partition_n_docs in statistics:
+        # The terms of a partition are unique, so their columns can be added at once
+        columns = np.asarray([vocabulary[term] for term in partition_terms], dtype=np.int64)
+        dfs[columns] += partition_dfs
+        tfs[columns] += partition_tfs
+        n_docs += partition_n_docs
+
+    mask = _limit_features(model, dfs, tfs, n_docs)
+    _set_vocabulary(model, terms, mask)
+
+    if isinstance(model, TfidfVectorizer):
+        # Same smoothed inverse document frequency as TfidfTransformer
+        dfs = dfs[mask].astype(np.float64) + int(model.smooth_idf)
+        model.idf_ = np.log((n_docs + int(model.smooth_idf)) / dfs) + 1.0
+
+
+def parallel_fit_transform(model, documents: list, n_jobs: int) -> csr_matrix:
+    """Fits a text embedding model on a list of documents and returns their embeddings, in parallel.
+
+    The documents are split into one chunk per worker. For hashing, the chunks are transformed independently. For
+    count and TF-IDF models, the chunks are tokenized and counted in the workers, and their vocabularies and document
+    frequencies are merged into the fitted model in a single pass over the documents.
+
+    Args:
+        model: Unfitted TfidfVectorizer, HashingVectorizer, or CountVectorizer instance.
+        documents (list): Documents to fit the model on.
+        n_jobs (int): Number of worker processes. -1 means using all processors.
+
+    Returns:
+        csr_matrix: Embedding matrix of the documents.
+    """
+    n_workers = min(effective_n_jobs(n_jobs), len(documents))
+    if n_workers <= 1:
+        return model.fit_transform(documents)
+
+    validate_model_params(model)
+    chunks = _chunks(documents, n_workers)
+
+    if isinstance(model, HashingVectorizer):
+        embeddings = Parallel(n_jobs=n_workers)(
+            delayed(model.transform)(chunk) for chunk in chunks
+        )
+        return vstack(embeddings, format="csr")
+
+    # A fixed vocabulary leaves nothing to merge, and idf_ can only be set on a TF-IDF model with use_idf=True
+    if model.vocabulary is not None or (
+        isinstance(model, TfidfVectorizer) and not model.use_idf
+    ):
+        return model.fit_transform(documents)
+
+    counted = Parallel(n_jobs=n_workers)(
+        delayed(_count_chunk)(model, chunk) for chunk in chunks
+    )
+    terms, counts = _merge_chunks(counted)
+    mask = _limit_features(
+        model,
+        np.bincount(counts.indices, minlength=len(terms)),
+        np.asarray(counts.sum(axis=0)).ravel(),
+        counts.shape[0],
+    )
+    _set_vocabulary(model, terms, mask)
+    if not mask.all():
+        counts = counts[:, np.flatnonzero(mask)]
+
+    counts.sort_indices()
+    if model.binary:
+        counts.data.fill(1)
+    counts = counts.astype(model.dtype)
+
+    if isinstance(model, TfidfVectorizer):
+        transformer = TfidfTransformer(
+            norm=model.norm,
+            use_idf=model.use_idf,
+            smooth_idf=model.smooth_idf,
+            sublinear_tf=model.sublinear_tf,
+        )
+        embeddings = transformer.fit_transform(counts)
+        model.idf_ = transformer.idf_
+        return embeddings
+
+    return counts
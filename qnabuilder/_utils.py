@@ -1,4 +1,9 @@
-from typing import Any
+import re
+import sys
+from typing import Any, Iterable, Optional
+
+import numpy as np
+from scipy.sparse import issparse
 
 
 def parse_list_options(options: list) -> str:
@@ -42,3 +47,63 @@ def check_value_error(name: str, value: Any, options: list):
 def check_type_error(name: str, value: Any, acceptable: Any):
     if not isinstance(value, type(acceptable)):
         raise TypeError(type_error_message(name, value, acceptable))
+
+
+_PUNCTUATION_PATTERN = re.compile(r"[^\w\s]")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_text(text: str, rules: Iterable[str]) -> str:
+    """Returns the normalized version of a text according to a set of normalization rules.
+
+    Args:
+        text (str): Text to be normalized.
+        rules (Iterable[str]): Names of the normalization rules to apply. Supported rules are 'lowercase',
+                               'whitespace', and 'punctuation'.
+
+    Returns:
+        str: Normalized text.
+    """
+    if "lowercase" in rules:
+        text = text.casefold()
+    if "punctuation" in rules:
+        text = _PUNCTUATION_PATTERN.sub("", text)
+    if "whitespace" in rules:
+        text = _WHITESPACE_PATTERN.sub(" ", text).strip()
+    return text
+
+
+def deep_getsizeof(obj: Any, seen: Optional[set] = None) -> int:
+    """Returns the size of an object in bytes, including the objects it contains.
+
+    Args:
+        obj (Any): Object whose size is measured. Containers are traversed recursively, and NumPy arrays and SciPy
+                   sparse matrices are measured by the size of their buffers.
+        seen (Optional[set]): IDs of the objects already measured, which are not counted again. Defaults to None.
+
+    Returns:
+        int: Size of the object in bytes.
+    """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if issparse(obj):
+        return sum(
+            deep_getsizeof(getattr(obj, name), seen)
+            for name in ("data", "indices", "indptr")
+            if hasattr(obj, name)
+        )
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(
+            deep_getsizeof(key, seen) + deep_getsizeof(value, seen)
+            for key, value in obj.items()
+        )
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_getsizeof(item, seen) for item in obj)
+    return size
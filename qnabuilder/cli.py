@@ -0,0 +1,337 @@
+"""
+Command-line interface of QnA Builder.
+
+Usage examples:
+    qnabuilder save --kb knowledge_base.json --exact-match -o bot.pkl
+    qnabuilder answer --bot bot.pkl --batch-size 1024 --n-jobs 4 questions.txt > answers.jsonl
+    cat questions.jsonl | qnabuilder answer --format jsonl --field text
+"""
+
+import argparse
+import json
+import pickle
+import sys
+import time
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .kb import DEFAULT_KNOWLEDGE_BASE_FILE_PATH
+from .qna_bot import QnABot
+from ._enums import EmbeddingModel, SimilarityMetric
+
+
+__all__ = ["main"]
+
+
+_worker_bot: Optional[QnABot] = None
+
+# Fields added to every input record by the answer subcommand
+_RESULT_FIELDS = ("answer", "score", "qna_id")
+
+
+def _add_bot_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--kb",
+        default=DEFAULT_KNOWLEDGE_BASE_FILE_PATH,
+        help="path to the knowledge base JSON file (default: the bundled knowledge base)",
+    )
+    parser.add_argument(
+        "--model-name",
+        default="tfidf",
+        choices=[e.value for e in EmbeddingModel],
+        help="text embedding model (default: tfidf)",
+    )
+    parser.add_argument(
+        "--similarity-metric",
+        default="cosine",
+        choices=[e.value for e in SimilarityMetric],
+        help="similarity metric (default: cosine)",
+    )
+    parser.add_argument(
+        "--min-score",
+        type=float,
+        default=0.25,
+        help="minimum similarity score of a matched question (default: 0.25)",
+    )
+    parser.add_argument(
+        "--exact-match",
+        action="store_true",
+        help="answer exact matches of the normalized reference questions from a hash index",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="collapse duplicated reference embeddings at fit time",
+    )
+    parser.add_argument(
+        "--compact-threshold",
+        type=float,
+        default=None,
+        help="cosine similarity at or above which reference questions are collapsed as near-duplicates",
+    )
+    parser.add_argument(
+        "--fit-jobs",
+        type=int,
+        default=None,
+        help="number of processes used to fit the embedding model (-1 for all processors)",
+    )
+
+
+def _fit_bot(args: argparse.Namespace) -> Tuple[QnABot, dict]:
+    bot = QnABot(
+        model_name=args.model_name,
+        similarity_metric=args.similarity_metric,
+        min_score=args.min_score,
+        cache=True,
+        exact_match=args.exact_match,
+        compact=args.compact or args.compact_threshold is not None,
+        compact_threshold=args.compact_threshold,
+        n_jobs=args.fit_jobs,
+    )
+
+    start = time.perf_counter()
+    bot.fit(args.kb)
+    summary = {
+        "kb": str(args.kb),
+        "n_qna": len(bot.knowledge_base_.qna),
+        "n_ref_questions": len(bot.knowledge_base_.ref_questions),
+        "n_ref_embeddings": bot.ref_embeddings_.shape[0],
+        "n_features": bot.ref_embeddings_.shape[1],
+        "nnz": int(bot.ref_embeddings_.nnz),
+        "fit_seconds": round(time.perf_counter() - start, 3),
+    }
+    return bot, summary
+
+
+def _read_questions(
+    files: List[str], format: str, field: str, strict: bool = False
+) -> Iterator[Tuple[str, dict]]:
+    for path in files:
+        file = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+        try:
+            for line_number, line in enumerate(file, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                if format == "jsonl":
+                    try:
+                        record = json.loads(line)
+                        if not isinstance(record, dict):
+                            raise TypeError(
+                                f"expected a JSON object, got {type(record).__name__}"
+                            )
+                        question = record[field]
+                        if not isinstance(question, str):
+                            raise TypeError(
+                                f"expected a string in field {field!r}, got {type(question).__name__}"
+                            )
+                    except (json.JSONDecodeError, KeyError, TypeError) as e:
+                        if strict:
+                            raise
+                        # Skip malformed lines so that a single bad record does not stop a bulk run
+                        print(
+                            f"qnabuilder: skipping line {line_number} of {path}: {type(e).__name__}: {e}",
+                            file=sys.stderr,
+                        )
+                        continue
+                    overwritten = [name for name in _RESULT_FIELDS if name in record]
+                    if overwritten:
+                        message = (
+                            f"line {line_number} of {path} has the fields {overwritten}, "
+                            "which are overwritten by the results"
+                        )
+                        if strict:
+                            raise ValueError(message)
+                        print(f"qnabuilder: {message}", file=sys.stderr)
+                    yield question, record
+                else:
+                    yield line, {field: line}
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+
+def _batches(items: Iterable, batch_size: int) -> Iterator[list]:
+    items = iter(items)
+    while True:
+        batch = list(islice(items, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _answer_batch(
+    bot: QnABot, batch: List[Tuple[str, dict]], seed: Optional[int]
+) -> List[str]:
+    rng = np.random if seed is None else np.random.RandomState(seed)
+    qna = bot.knowledge_base_.qna
+    idk_answers = bot.knowledge_base_.idk_answers
+
+    lines = []
+    for (qna_id, score), (_, record) in zip(
+        bot.find_similarities([question for question, _ in batch]), batch
+    ):
+        answers = idk_answers if score < bot.min_score else qna[qna_id]["a"]
+        record = dict(
+            record,
+            answer=answers[rng.randint(len(answers))],
+            score=score,
+            qna_id=qna_id,
+        )
+        lines.append(json.dumps(record, ensure_ascii=False))
+    return lines
+
+
+def _init_worker(bot: QnABot) -> None:
+    global _worker_bot
+    _worker_bot = bot
+
+
+def _answer_batch_in_worker(batch: List[Tuple[str, dict]], seed: Optional[int]):
+    return _answer_batch(_worker_bot, batch, seed)
+
+
+def _answer(args: argparse.Namespace) -> int:
+    if args.bot is not None:
+        with open(args.bot, "rb") as file:
+            bot: QnABot = pickle.load(file)
+    else:
+        bot, _ = _fit_bot(args)
+
+    questions = _read_questions(args.files, args.format, args.field, args.strict)
+    batches = enumerate(_batches(questions, args.batch_size))
+
+    def batch_seed(index: int) -> Optional[int]:
+        return None if args.seed is None else args.seed + index
+
+    if args.n_jobs == 1:
+        for index, batch in batches:
+            sys.stdout.write("\n".join(_answer_batch(bot, batch, batch_seed(index))) + "\n")
+        sys.stdout.flush()
+        return 0
+
+    # Keep a bounded number of batches in flight and write their answers in the input order
+    with Pool(args.n_jobs, initializer=_init_worker, initargs=(bot,)) as pool:
+        pending = deque()
+        for index, batch in batches:
+            pending.append(
+                pool.apply_async(_answer_batch_in_worker, (batch, batch_seed(index)))
+            )
+            if len(pending) >= 2 * args.n_jobs:
+                sys.stdout.write("\n".join(pending.popleft().get()) + "\n")
+        while pending:
+            sys.stdout.write("\n".join(pending.popleft().get()) + "\n")
+    sys.stdout.flush()
+    return 0
+
+
+def _fit(args: argparse.Namespace) -> int:
+    _, summary = _fit_bot(args)
+    print(json.dumps(summary))
+    return 0
+
+
+def _save(args: argparse.Namespace) -> int:
+    bot, summary = _fit_bot(args)
+    with open(args.output, "wb") as file:
+        pickle.dump(bot, file, protocol=pickle.HIGHEST_PROTOCOL)
+    print(json.dumps(dict(summary, output=args.output)))
+    return 0
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="qnabuilder", description="Similarity-based conversational dialog engine."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    answer = subparsers.add_parser(
+        "answer", help="answer questions read from files or stdin as JSONL"
+    )
+    answer.add_argument(
+        "files",
+        nargs="*",
+        default=["-"],
+        help="files to read questions from, '-' for stdin (default: stdin)",
+    )
+    answer.add_argument(
+        "--format",
+        default="lines",
+        choices=["lines", "jsonl"],
+        help="input format: one question per line, or one JSON object per line (default: lines)",
+    )
+    answer.add_argument(
+        "--field",
+        default="question",
+        help="field holding the question in JSONL input and output (default: question)",
+    )
+    answer.add_argument(
+        "--strict",
+        action="store_true",
+        help="stop at the first malformed JSONL line, or at the first line with a field overwritten by the results, "
+        "instead of warning on stderr",
+    )
+    answer.add_argument(
+        "--bot",
+        default=None,
+        help="fitted bot file written by 'qnabuilder save'; if omitted, a bot is fitted from the options below",
+    )
+    answer.add_argument(
+        "--batch-size",
+        type=int,
+        default=256,
+        help="number of questions scored at once (default: 256)",
+    )
+    answer.add_argument(
+        "--n-jobs",
+        type=int,
+        default=1,
+        help="number of processes answering batches (default: 1)",
+    )
+    answer.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="seed making the choice among the answers of a question reproducible",
+    )
+    _add_bot_arguments(answer)
+    answer.set_defaults(func=_answer)
+
+    fit = subparsers.add_parser(
+        "fit", help="fit a bot to a knowledge base and print a summary"
+    )
+    _add_bot_arguments(fit)
+    fit.set_defaults(func=_fit)
+
+    save = subparsers.add_parser(
+        "save", help="fit a bot to a knowledge base and save it to a file"
+    )
+    save.add_argument("-o", "--output", required=True, help="output file path")
+    _add_bot_arguments(save)
+    save.set_defaults(func=_save)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Runs the QnA Builder command-line interface.
+
+    Args:
+        argv (Optional[List[str]]): Command-line arguments. Defaults to sys.argv[1:].
+
+    Returns:
+        int: Exit code.
+    """
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if args.command == "answer" and (args.batch_size < 1 or args.n_jobs < 1):
+        parser.error("--batch-size and --n-jobs must be positive integers")
+    if args.command == "answer" and args.field in _RESULT_FIELDS:
+        parser.error(
+            "--field cannot be one of the result fields: %s" % ", ".join(_RESULT_FIELDS)
+        )
+    return args.func(args)
@@ -1,8 +1,9 @@
 import json
 import subprocess
-from typing import List
+from typing import List, Optional
 
 from .validators import check_kb_schema
+from .._utils import deep_getsizeof
 from ._const import KNOWLEDGE_BASE_EDITOR_FILE_PATH
 from ._types import FilePath, QnA, QnAKbMapping, QnAKbMappingExtra
 
@@ -52,9 +53,11 @@ class QnAKnowledgeBase:
         return dict(qna=kb["qna"], idk_answers=kb["idk_answers"])
 
     def _set_info(self, info: dict):
-        self._info["name"] = info.get("name")
-        self._info["version"] = info.get("version")
-        self._info["author"] = info.get("author")
+        self._info = {
+            "name": info.get("name"),
+            "version": info.get("version"),
+            "author": info.get("author"),
+        }
 
     @staticmethod
     def _ref_questions(qna: List[QnA]):
@@ -132,6 +135,18 @@ class QnAKnowledgeBase:
                 self._load(filepath_or_buffer=self.filepath_or_buffer)["qna"]
             )[1]
 
+    def memory_usage(self, seen: Optional[set] = None) -> int:
+        """Returns the number of bytes used by the knowledge base data cached in memory.
+
+        Args:
+            seen (Optional[set]): IDs of the objects already measured, which are not counted again. Defaults to None.
+
+        """
+        if self.cache and self._is_loaded:
+            return deep_getsizeof(self._cache_data, seen)
+        else:
+            return 0
+
     def run_editor(self):
         """Opens the knowledge base editor app in the web browser.
 
@@ -0,0 +1,448 @@
+"""
+Load-testing harness of QnA Builder.
+
+Replays a recorded query log, or a synthetic Zipf-distributed one drawn from the knowledge base, against
+QnABot.answer() at several concurrency levels using threads, processes, and asyncio. Reports throughput, latency
+percentiles, exact-match hit ratios, and CPU and RSS samples over time. CPU and RSS samples include the worker
+processes only if the optional psutil package is installed.
+
+Usage examples:
+    python -m qnabuilder.loadtest
+    python -m qnabuilder.loadtest --log queries.jsonl --format jsonl --field text --exact-match
+    python -m qnabuilder.loadtest --synthetic 50000 --zipf 1.2 --modes threads processes --concurrency 1 2 4 8
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import pickle
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .cli import _add_bot_arguments, _fit_bot, _read_questions
+from .qna_bot import QnABot
+from ._utils import check_value_error
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+__all__ = ["synthetic_queries", "run_load_test", "main"]
+
+
+MODES = ["threads", "processes", "asyncio"]
+
+_worker_bot: Optional[QnABot] = None
+
+
+def synthetic_queries(
+    questions: List[str],
+    n_queries: int,
+    zipf: float = 1.1,
+    noise: float = 0.0,
+    seed: Optional[int] = None,
+) -> List[str]:
+    """Returns a synthetic query log whose questions follow a Zipf distribution.
+
+    Args:
+        questions (List[str]): Questions to draw the queries from, e.g., the reference questions of a knowledge base.
+        n_queries (int): Number of queries.
+        zipf (float): Exponent of the Zipf distribution. Higher values concentrate the queries on fewer questions.
+                      Defaults to 1.1.
+        noise (float): Fraction of the queries whose words are shuffled, so that they miss exact matches.
+                       Defaults to 0.0.
+        seed (Optional[int]): Seed of the random number generator. Defaults to None.
+
+    Returns:
+        List[str]: Synthetic queries.
+    """
+    rng = np.random.RandomState(seed)
+    ranked = rng.permutation(len(questions))
+    probabilities = 1.0 / np.arange(1, len(questions) + 1) ** zipf
+    probabilities /= probabilities.sum()
+
+    queries = []
+    for i in ranked[rng.choice(len(questions), size=n_queries, p=probabilities)]:
+        query = questions[i]
+        if noise > 0 and rng.random_sample() < noise:
+            words = query.split()
+            rng.shuffle(words)
+            query = " ".join(words)
+        queries.append(query)
+    return queries
+
+
+def _resource_snapshot() -> Tuple[float, int]:
+    # CPU seconds and RSS bytes of this process and its worker processes
+    if psutil is not None:
+        processes = [psutil.Process()]
+        processes += processes[0].children(recursive=True)
+        cpu, rss = 0.0, 0
+        for process in processes:
+            try:
+                cpu_times = process.cpu_times()
+                cpu += cpu_times.user + cpu_times.system
+                rss += process.memory_info().rss
+            except psutil.Error:
+                pass
+        return cpu, rss
+
+    times = os.times()
+    cpu = times.user + times.system + times.children_user + times.children_system
+    try:
+        with open("/proc/self/statm") as file:
+            rss = int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+
+        # ru_maxrss is the peak RSS, in kilobytes on Linux and in bytes on macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        rss *= 1 if sys.platform == "darwin" else 1024
+    return cpu, rss
+
+
+class _ResourceSampler(threading.Thread):
+    def __init__(self, interval: float):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        start = time.perf_counter()
+        last_time, (last_cpu, _) = start, _resource_snapshot()
+        while not self._stop_event.wait(self.interval):
+            now, (cpu, rss) = time.perf_counter(), _resource_snapshot()
+            self.samples.append(
+                {
+                    "t": round(now - start, 3),
+                    "cpu_percent": round(100.0 * (cpu - last_cpu) / (now - last_time), 1),
+                    "rss_mb": round(rss / 2 ** 20, 1),
+                }
+            )
+            last_time, last_cpu = now, cpu
+
+    def stop(self) -> List[dict]:
+        self._stop_event.set()
+        self.join()
+        return self.samples
+
+
+def _replay(bot: QnABot, queries: List[str], next_index) -> List[float]:
+    latencies = []
+    while True:
+        i = next(next_index)
+        if i >= len(queries):
+            return latencies
+        start = time.perf_counter()
+        bot.answer(queries[i])
+        latencies.append(time.perf_counter() - start)
+
+
+def _run_threads(bot: QnABot, queries: List[str], concurrency: int) -> List[float]:
+    next_index = itertools.count()
+    with ThreadPoolExecutor(concurrency) as executor:
+        futures = [
+            executor.submit(_replay, bot, queries, next_index)
+            for _ in range(concurrency)
+        ]
+        return [latency for future in futures for latency in future.result()]
+
+
+def _run_asyncio(bot: QnABot, queries: List[str], concurrency: int) -> List[float]:
+    # Each client awaits answers computed in a thread pool, as an asyncio server would
+    async def client(loop, executor, next_index, latencies):
+        while True:
+            i = next(next_index)
+            if i >= len(queries):
+                return
+            start = time.perf_counter()
+            await loop.run_in_executor(executor, bot.answer, queries[i])
+            latencies.append(time.perf_counter() - start)
+
+    async def run():
+        loop = asyncio.get_event_loop()
+        next_index, latencies = itertools.count(), []
+        with ThreadPoolExecutor(concurrency) as executor:
+            await asyncio.gather(
+                *(
+                    client(loop, executor, next_index, latencies)
+                    for _ in range(concurrency)
+                )
+            )
+        return latencies
+
+    return asyncio.run(run())
+
+
+def _init_worker(bot: QnABot) -> None:
+    global _worker_bot
+    _worker_bot = bot
+
+
+def _warm_up(_) -> None:
+    pass
+
+
+def _replay_in_worker(queries: List[str]) -> Tuple[List[float], dict, float, float]:
+    stats = _worker_bot.stats_
+    start = time.time()
+    latencies = _replay(_worker_bot, queries, itertools.count())
+    end = time.time()
+    stats = {
+        key: _worker_bot.stats_[key] - stats[key] for key in ("n_queries", "n_exact_hits")
+    }
+    return latencies, stats, start, end
+
+
+def _run_processes(
+    pool: Pool, queries: List[str], concurrency: int
+) -> Tuple[List[float], dict, float]:
+    results = pool.map(
+        _replay_in_worker,
+        [queries[i::concurrency] for i in range(concurrency)],
+        chunksize=1,
+    )
+    latencies = [latency for result in results for latency in result[0]]
+    stats = {
+        key: sum(result[1][key] for result in results)
+        for key in ("n_queries", "n_exact_hits")
+    }
+    # Time from the first query dispatched by any worker to the last answer, excluding the pool overhead
+    seconds = max(result[3] for result in results) - min(result[2] for result in results)
+    return latencies, stats, seconds
+
+
+def run_load_test(
+    bot: QnABot,
+    queries: List[str],
+    mode: str = "threads",
+    concurrency: int = 1,
+    sample_interval: float = 0.5,
+) -> dict:
+    """Replays a query log against a fitted QnA Bot and returns the measured performance.
+
+    Args:
+        bot (QnABot): Fitted QnA Bot.
+        queries (List[str]): Queries to replay, each answered once.
+        mode (str): How queries are answered concurrently: 'threads', 'processes', or 'asyncio'.
+                    Defaults to 'threads'.
+        concurrency (int): Number of concurrent threads, processes, or asyncio clients. Defaults to 1.
+        sample_interval (float): Seconds between CPU and RSS samples. Defaults to 0.5.
+
+    Returns:
+        dict: Throughput in queries per second, latency percentiles in milliseconds, exact-match hit ratio, and
+              CPU and RSS samples over time.
+    """
+    check_value_error("mode", mode, MODES)
+
+    stats = bot.stats_
+
+    if mode == "processes":
+        # Start the workers and unpickle the bot in each of them before the clock starts
+        with Pool(concurrency, initializer=_init_worker, initargs=(bot,)) as pool:
+            pool.map(_warm_up, range(concurrency), chunksize=1)
+            sampler = _ResourceSampler(sample_interval)
+            sampler.start()
+            latencies, run_stats, seconds = _run_processes(pool, queries, concurrency)
+            samples = sampler.stop()
+    else:
+        sampler = _ResourceSampler(sample_interval)
+        sampler.start()
+        start = time.perf_counter()
+        run = _run_threads if mode == "threads" else _run_asyncio
+        latencies = run(bot, queries, concurrency)
+        seconds = time.perf_counter() - start
+        samples = sampler.stop()
+        run_stats = {
+            key: bot.stats_[key] - stats[key] for key in ("n_queries", "n_exact_hits")
+        }
+
+    latencies_ms = 1000.0 * np.asarray(latencies)
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "n_queries": len(latencies),
+        "seconds": round(seconds, 3),
+        "qps": round(len(latencies) / seconds, 1),
+        "latency_ms": {
+            "mean": round(float(latencies_ms.mean()), 3),
+            **{
+                f"p{q}": round(float(np.percentile(latencies_ms, q)), 3)
+                for q in (50, 90, 95, 99)
+            },
+            "max": round(float(latencies_ms.max()), 3),
+        },
+        "exact_hit_rate": round(
+            run_stats["n_exact_hits"] / run_stats["n_queries"], 4
+        )
+        if run_stats["n_queries"]
+        else 0.0,
+        "peak_rss_mb": max((s["rss_mb"] for s in samples), default=None),
+        "resources": samples,
+    }
+
+
+def _print_table(results: List[dict]) -> None:
+    columns = ["mode", "concurrency", "qps", "p50", "p90", "p99", "max", "exact_hits", "cpu%", "peak_rss_mb"]
+    rows = []
+    for result in results:
+        cpu = [s["cpu_percent"] for s in result["resources"]]
+        rows.append(
+            [
+                result["mode"],
+                result["concurrency"],
+                result["qps"],
+                result["latency_ms"]["p50"],
+                result["latency_ms"]["p90"],
+                result["latency_ms"]["p99"],
+                result["latency_ms"]["max"],
+                result["exact_hit_rate"],
+                round(sum(cpu) / len(cpu), 1) if cpu else "-",
+                result["peak_rss_mb"] if result["peak_rss_mb"] is not None else "-",
+            ]
+        )
+
+    widths = [max(len(str(row[i])) for row in [columns] + rows) for i in range(len(columns))]
+    for row in [columns] + rows:
+        print("  ".join(str(value).rjust(width) for value, width in zip(row, widths)))
+    print("latencies in milliseconds")
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m qnabuilder.loadtest",
+        description="Replay a query log against QnABot.answer() and report its performance.",
+    )
+    parser.add_argument(
+        "--log",
+        nargs="*",
+        default=None,
+        help="query log files, '-' for stdin; if omitted, a synthetic Zipf-distributed log is used",
+    )
+    parser.add_argument(
+        "--format",
+        default="lines",
+        choices=["lines", "jsonl"],
+        help="query log format: one query per line, or one JSON object per line (default: lines)",
+    )
+    parser.add_argument(
+        "--field",
+        default="question",
+        help="field holding the query in a JSONL query log (default: question)",
+    )
+    parser.add_argument(
+        "--synthetic",
+        type=int,
+        default=2000,
+        help="number of queries in the synthetic log (default: 2000)",
+    )
+    parser.add_argument(
+        "--zipf",
+        type=float,
+        default=1.1,
+        help="exponent of the Zipf distribution of the synthetic log (default: 1.1)",
+    )
+    parser.add_argument(
+        "--noise",
+        type=float,
+        default=0.1,
+        help="fraction of synthetic queries whose words are shuffled (default: 0.1)",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="seed of the synthetic log (default: 0)"
+    )
+    parser.add_argument(
+        "--bot",
+        default=None,
+        help="fitted bot file written by 'qnabuilder save'; if omitted, a bot is fitted from the options below",
+    )
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        default=["threads"],
+        choices=MODES,
+        help="concurrency modes (default: threads)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        nargs="+",
+        type=int,
+        default=[1, 4],
+        help="concurrency levels (default: 1 4)",
+    )
+    parser.add_argument(
+        "--sample-interval",
+        type=float,
+        default=0.5,
+        help="seconds between CPU and RSS samples (default: 0.5)",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="print the results, including CPU and RSS samples, as JSON instead of a table",
+    )
+    _add_bot_arguments(parser)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Runs the load-testing harness.
+
+    Args:
+        argv (Optional[List[str]]): Command-line arguments. Defaults to sys.argv[1:].
+
+    Returns:
+        int: Exit code.
+    """
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if any(concurrency < 1 for concurrency in args.concurrency):
+        parser.error("--concurrency levels must be positive integers")
+
+    if args.bot is not None:
+        with open(args.bot, "rb") as file:
+            bot: QnABot = pickle.load(file)
+    else:
+        bot, _ = _fit_bot(args)
+
+    if args.log is not None:
+        queries = [
+            query for query, _ in _read_questions(args.log or ["-"], args.format, args.field)
+        ]
+    else:
+        queries = synthetic_queries(
+            bot.knowledge_base_.ref_questions,
+            args.synthetic,
+            zipf=args.zipf,
+            noise=args.noise,
+            seed=args.seed,
+        )
+    if not queries:
+        parser.error("the query log is empty")
+
+    results = [
+        run_load_test(bot, queries, mode, concurrency, args.sample_interval)
+        for mode in args.modes
+        for concurrency in args.concurrency
+    ]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        _print_table(results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
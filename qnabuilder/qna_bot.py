@@ -1,4 +1,4 @@
-from typing import Any, Tuple, Union
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 from scipy.sparse import csr_matrix
@@ -18,15 +18,29 @@ from sklearn.metrics.pairwise import (
 )
 
 from .kb import QnAKnowledgeBase, FilePath, DEFAULT_KNOWLEDGE_BASE_FILE_PATH
-from ._enums import EmbeddingModel, SimilarityMetric
-from ._utils import value_error_message
+from ._compaction import CompactionReport, compact_embeddings
+from ._parallel import parallel_fit_transform
+from ._enums import (
+    EmbeddingModel,
+    SimilarityMetric,
+    NormalizationRule,
+    MemoryBudgetAction,
+)
+from ._exceptions import MemoryBudgetExceededError
+from ._utils import (
+    value_error_message,
+    check_value_error,
+    normalize_text,
+    deep_getsizeof,
+)
 
 
 class QnABot:
     _is_fitted: bool = False
     _model_kwargs: dict = {}
 
-    _params = {"kb": None, "model": None, "ref_embeddings": None}
+    _params: dict = {}
+    _stats = {"n_queries": 0, "n_exact_hits": 0}
 
     def __init__(
         self,
@@ -34,6 +48,18 @@ class QnABot:
         similarity_metric: Union[str, SimilarityMetric] = "cosine",
         min_score: float = 0.25,
         cache: bool = False,
+        exact_match: bool = False,
+        normalization: Sequence[Union[str, NormalizationRule]] = (
+            "lowercase",
+            "whitespace",
+            "punctuation",
+        ),
+        compact: bool = False,
+        compact_threshold: Optional[float] = None,
+        n_jobs: Optional[int] = None,
+        drop_unused_attributes: bool = False,
+        memory_budget: Optional[int] = None,
+        memory_budget_action: Union[str, MemoryBudgetAction] = "raise",
         **kwargs
     ) -> None:
         """Initializes an instance of the QnABot class.
@@ -45,6 +71,32 @@ class QnABot:
             min_score (float): Minimum similarity score below which an "I don't know" answer will be returned.
                                Defaults to 0.25.
             cache (bool): Whether to cache the entire knowledge base in memory. Defaults to False.
+            exact_match (bool): Whether to look up the normalized input in a hash index of the reference questions
+                                before computing similarities. Defaults to False.
+            normalization (Sequence[Union[str, NormalizationRule]]): Normalization rules applied to the input and
+                                                                     reference questions for exact matching.
+                                                                     Defaults to ('lowercase', 'whitespace',
+                                                                     'punctuation').
+            compact (bool): Whether to collapse duplicated rows of the reference embedding matrix at fit time.
+                            Defaults to False.
+            compact_threshold (Optional[float]): Cosine similarity at or above which two reference questions are
+                                                 collapsed as near-duplicates when compact=True. If None, only
+                                                 identical embeddings are collapsed. Defaults to None.
+            n_jobs (Optional[int]): Number of worker processes used to fit the embedding model. None means 1 and -1
+                                    means using all processors. Defaults to None.
+            drop_unused_attributes (bool): Whether to drop the fitted attributes of the embedding model that are not
+                                           needed to answer questions, such as stop_words_. Defaults to False.
+            memory_budget (Optional[int]): Maximum number of bytes the fitted QnA Bot may use, as reported by
+                                           memory_usage(). If None, memory usage is not limited. Defaults to None.
+            memory_budget_action (Union[str, MemoryBudgetAction]): Action taken when fitting exceeds the memory budget.
+                                                                   'raise' raises a MemoryBudgetExceededError, and
+                                                                   'compact' drops unused attributes, collapses
+                                                                   identical reference embeddings, and stores QnA IDs
+                                                                   not shared with the knowledge base cache as a
+                                                                   32-bit array before raising. With 'raise', fit()
+                                                                   fails right after vectorization, before compaction
+                                                                   and the exact-match index are built.
+                                                                   Defaults to 'raise'.
             **kwargs: Other keyword arguments supported to initialize models.
 
         """
@@ -52,8 +104,25 @@ class QnABot:
         self.similarity_metric: str = similarity_metric
         self.min_score: float = min_score
         self.cache: bool = cache
+        self.exact_match: bool = exact_match
+        self.normalization: Sequence[str] = normalization
+        self.compact: bool = compact
+        self.compact_threshold: Optional[float] = compact_threshold
+        self.n_jobs: Optional[int] = n_jobs
+        self.drop_unused_attributes: bool = drop_unused_attributes
+        self.memory_budget: Optional[int] = memory_budget
+        self.memory_budget_action: str = memory_budget_action
 
         self._model_kwargs = kwargs
+        self._params = {
+            "kb": None,
+            "model": None,
+            "ref_embeddings": None,
+            "ref_questions_idx": None,
+            "compaction_report": None,
+            "normalization": None,
+            "exact_index": None,
+        }
 
     @staticmethod
     def _initialize_model(model_name: str, **kwargs):
@@ -70,6 +139,24 @@ class QnABot:
                 )
             )
 
+    @staticmethod
+    def _normalization_rules(normalization: Sequence[str]) -> Tuple[str, ...]:
+        for rule in normalization:
+            check_value_error(
+                "normalization rule", rule, [e.value for e in NormalizationRule]
+            )
+        return tuple(NormalizationRule(rule).value for rule in normalization)
+
+    @staticmethod
+    def _build_exact_index(
+        ref_questions: list, ref_questions_idx: list, rules: Sequence[str]
+    ) -> Dict[str, int]:
+        index = {}
+        for question, qna_id in zip(ref_questions, ref_questions_idx):
+            # Keep the first QnA group of a duplicated question, as argmax does for tied scores
+            index.setdefault(normalize_text(question, rules), qna_id)
+        return index
+
     def fit(
         self, kb: Union[FilePath, QnAKnowledgeBase] = DEFAULT_KNOWLEDGE_BASE_FILE_PATH
     ):
@@ -84,38 +171,163 @@ class QnABot:
             self: The instance itself.
         """
         self._is_fitted = False
+        if self.memory_budget is not None:
+            check_value_error(
+                "memory_budget_action",
+                self.memory_budget_action,
+                [e.value for e in MemoryBudgetAction],
+            )
         self._params["kb"] = (
             kb if isinstance(kb, QnAKnowledgeBase) else QnAKnowledgeBase(kb, self.cache)
         )
         self._params["model"] = self._initialize_model(
             model_name=self.model_name, **self._model_kwargs
         )
-        self._params["model"].fit(self.knowledge_base_.ref_questions)
-        self._params["ref_embeddings"] = self.model_.transform(
-            self.knowledge_base_.ref_questions
+        ref_questions = self.knowledge_base_.ref_questions
+        ref_questions_idx = self.knowledge_base_.ref_questions_idx
+
+        # Fail fast if the cached knowledge base alone does not fit in the memory budget
+        if self.memory_budget is not None:
+            kb_usage = self.knowledge_base_.memory_usage()
+            self._check_memory_budget({"knowledge_base": kb_usage, "total": kb_usage})
+
+        self._params["ref_embeddings"] = parallel_fit_transform(
+            self.model_, ref_questions, n_jobs=self.n_jobs
         )
+        self._params["ref_questions_idx"] = ref_questions_idx
+        self._params["compaction_report"] = None
+        self._params["normalization"] = None
+        self._params["exact_index"] = None
+
+        if self.compact:
+            (
+                self._params["ref_embeddings"],
+                self._params["ref_questions_idx"],
+                self._params["compaction_report"],
+            ) = compact_embeddings(
+                self.ref_embeddings_, ref_questions_idx, self.compact_threshold
+            )
+        if self.drop_unused_attributes:
+            self._drop_unused_attributes()
+
+        # Fail before the exact-match index is built if the compacted embeddings already exceed the budget
+        if self.memory_budget is not None and self.memory_budget_action == "raise":
+            self._check_memory_budget(self._memory_usage())
+
+        if self.exact_match:
+            self._params["normalization"] = self._normalization_rules(self.normalization)
+            self._params["exact_index"] = self._build_exact_index(
+                ref_questions, ref_questions_idx, self._params["normalization"]
+            )
+        if self.memory_budget is not None:
+            self._enforce_memory_budget()
+        self._stats = {"n_queries": 0, "n_exact_hits": 0}
 
         self._is_fitted = True
         return self
 
-    @property
-    def _similarity_function(self):
+    def _drop_unused_attributes(self):
+        # stop_words_ is only kept by scikit-learn for introspection and can get large
+        if hasattr(self.model_, "stop_words_"):
+            delattr(self.model_, "stop_words_")
+
+    def _check_memory_budget(self, usage: Dict[str, int]):
+        if usage["total"] > self.memory_budget:
+            raise MemoryBudgetExceededError(
+                "QnA Bot would use %d bytes, which exceeds the memory budget of %d bytes (%s)"
+                % (
+                    usage["total"],
+                    self.memory_budget,
+                    ", ".join(
+                        "%s: %d" % item for item in usage.items() if item[0] != "total"
+                    ),
+                )
+            )
+
+    def _shares_kb_cache(self, obj: Any) -> bool:
+        return self.knowledge_base_.cache and obj is self.knowledge_base_.ref_questions_idx
+
+    def _enforce_memory_budget(self):
+        usage = self._memory_usage()
+        if usage["total"] > self.memory_budget and self.memory_budget_action == "compact":
+            self._drop_unused_attributes()
+            if self._params["compaction_report"] is None:
+                (
+                    self._params["ref_embeddings"],
+                    ref_questions_idx,
+                    self._params["compaction_report"],
+                ) = compact_embeddings(
+                    self.ref_embeddings_, self._params["ref_questions_idx"]
+                )
+                # Keep sharing the QnA IDs with the knowledge base cache if no row was removed
+                if self._params["compaction_report"]["removed"]:
+                    self._params["ref_questions_idx"] = ref_questions_idx
+            # A 32-bit copy of QnA IDs shared with the knowledge base cache would only add memory
+            if not self._shares_kb_cache(self._params["ref_questions_idx"]):
+                self._params["ref_questions_idx"] = np.asarray(
+                    self._params["ref_questions_idx"], dtype=np.int32
+                )
+            usage = self._memory_usage()
+        self._check_memory_budget(usage)
+
+    def _memory_usage(self) -> Dict[str, int]:
+        # Objects shared between components, such as the QnA IDs cached by the knowledge base, are counted once,
+        # under the knowledge base
+        seen = set()
+
+        def sizeof(obj: Any) -> int:
+            return 0 if obj is None else deep_getsizeof(obj, seen)
+
+        usage = {
+            "knowledge_base": self.knowledge_base_.memory_usage(seen),
+            "vocabulary": sizeof(getattr(self.model_, "vocabulary_", None)),
+            "stop_words": sizeof(getattr(self.model_, "stop_words_", None)),
+            "idf": sizeof(self.model_.idf_)
+            if isinstance(self.model_, TfidfVectorizer) and self.model_.use_idf
+            else 0,
+            "ref_embeddings": sizeof(self.ref_embeddings_),
+            "ref_questions_idx": sizeof(self._params["ref_questions_idx"]),
+            "exact_index": sizeof(self._params["exact_index"]),
+        }
+        usage["total"] = sum(usage.values())
+        return usage
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Returns the number of bytes used by each component of the fitted QnA Bot.
+
+        Returns:
+            Dict[str, int]: Bytes used by the vocabulary, stop words, and IDF vector of the embedding model, the
+                            reference embeddings and their QnA IDs, the exact-match index, the knowledge base data
+                            cached in memory, and their total.
+        """
+        if not self._is_fitted:
+            raise NotFittedError(
+                "The model is not fitted. Use fit() method before calling memory_usage()"
+            )
+        return self._memory_usage()
+
+    @staticmethod
+    def _get_similarity_function(similarity_metric: str):
         functions = {
             "cosine": cosine_similarity,
             "euclidean": euclidean_distances,
             "manhattan": manhattan_distances,
         }
 
-        if self.similarity_metric not in functions:
+        if similarity_metric not in functions:
             raise ValueError(
                 value_error_message(
                     "similarity_metric",
-                    self.similarity_metric,
+                    similarity_metric,
                     [e.value for e in SimilarityMetric],
                 )
             )
         else:
-            return functions[self.similarity_metric]
+            return functions[similarity_metric]
+
+    @property
+    def _similarity_function(self):
+        return self._get_similarity_function(self.similarity_metric)
 
     def find_similarity(self, input: str) -> Tuple[int, float]:
         """Returns the index and similarity score of the question in the knowledge base most similar to the input.
@@ -132,8 +344,16 @@ class QnABot:
                 "The model is not fitted. Use fit() method before calling answer()"
             )
 
-        # Retrieve questions' indices from knowledge base
-        q_idx = self.knowledge_base_.ref_questions_idx
+        self._stats["n_queries"] += 1
+
+        # Look up the normalized input in the exact-match index before vectorizing it
+        if self._params["exact_index"] is not None:
+            qna_id = self._params["exact_index"].get(
+                normalize_text(input, self._params["normalization"])
+            )
+            if qna_id is not None:
+                self._stats["n_exact_hits"] += 1
+                return qna_id, 1.0
 
         # Extract input statement embedding
         input_embeddings = self.model_.transform([input])
@@ -152,10 +372,68 @@ class QnABot:
         score = float(similarities[highest_id])
 
         # Find the ID of the answer with the highest score
-        highest_qna_id = q_idx[highest_id]
+        highest_qna_id = int(self._params["ref_questions_idx"][highest_id])
 
         return highest_qna_id, score
 
+    def find_similarities(self, inputs: List[str]) -> List[Tuple[int, float]]:
+        """Returns the indices and similarity scores of the questions in the knowledge base most similar to each input.
+
+        The inputs are vectorized and scored against the reference embeddings at once, which is considerably faster
+        than calling find_similarity() for each input.
+
+        Args:
+            inputs (List[str]): Input questions.
+
+        Returns:
+            List[Tuple[int, float]]: Index and similarity score of the most similar question for each input.
+        """
+        if not self._is_fitted:
+            raise NotFittedError(
+                "The model is not fitted. Use fit() method before calling answer()"
+            )
+
+        self._stats["n_queries"] += len(inputs)
+
+        results = [None] * len(inputs)
+        pending = list(range(len(inputs)))
+
+        # Look up the normalized inputs in the exact-match index before vectorizing them
+        if self._params["exact_index"] is not None:
+            pending = []
+            for i, input in enumerate(inputs):
+                qna_id = self._params["exact_index"].get(
+                    normalize_text(input, self._params["normalization"])
+                )
+                if qna_id is not None:
+                    results[i] = (qna_id, 1.0)
+                else:
+                    pending.append(i)
+            self._stats["n_exact_hits"] += len(inputs) - len(pending)
+
+        if not pending:
+            return results
+
+        similarities = self._similarity_function(
+            self.model_.transform([inputs[i] for i in pending]), self.ref_embeddings_
+        )
+
+        if self.similarity_metric != "cosine":
+            # Scale each row to [0, 1] as MinMaxScaler does in find_similarity()
+            min_ = similarities.min(axis=1, keepdims=True)
+            range_ = similarities.max(axis=1, keepdims=True) - min_
+            range_[range_ == 0.0] = 1.0
+            similarities = 1.0 - (similarities - min_) / range_
+
+        highest_ids = np.argmax(similarities, axis=1)
+        for row, (i, highest_id) in enumerate(zip(pending, highest_ids)):
+            results[i] = (
+                int(self._params["ref_questions_idx"][highest_id]),
+                float(similarities[row, highest_id]),
+            )
+
+        return results
+
     def answer(
         self, input: str, return_score: bool = False
     ) -> Union[str, Tuple[str, float]]:
@@ -187,6 +465,25 @@ class QnABot:
         else:
             return answer_
 
+    @property
+    def compaction_report_(self) -> Optional[CompactionReport]:
+        """Returns the report of the reference embedding rows removed at fit time, or None if compact=False.
+
+        """
+        return self._params["compaction_report"]
+
+    @property
+    def stats_(self) -> Dict[str, Union[int, float]]:
+        """Returns the query statistics collected since the QnA Bot was last fitted.
+
+        """
+        n_queries = self._stats["n_queries"]
+        return {
+            "n_queries": n_queries,
+            "n_exact_hits": self._stats["n_exact_hits"],
+            "exact_hit_rate": self._stats["n_exact_hits"] / n_queries if n_queries else 0.0,
+        }
+
     @property
     def knowledge_base_(self) -> QnAKnowledgeBase:
         """Returns the knowledge base on which the QnA Bot is fitted.
@@ -0,0 +1,411 @@
+import os
+import threading
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Client, Listener
+from typing import Any, List, Optional, Tuple, Union
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from sklearn.exceptions import NotFittedError
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
+
+from .kb import QnAKnowledgeBase, FilePath, QnA, DEFAULT_KNOWLEDGE_BASE_FILE_PATH
+from .qna_bot import QnABot
+from ._enums import EmbeddingModel, SimilarityMetric, ShardBackend
+from ._parallel import (
+    TermStatistics,
+    validate_model_params,
+    term_statistics,
+    fit_term_statistics,
+)
+from ._utils import check_value_error
+
+
+__all__ = ["ShardedQnABot"]
+
+
+# Best match of a shard: QnA ID, row of the reference question in the whole knowledge base, raw score of the
+# reference question, and the minimum and maximum raw scores over the shard
+ShardMatch = Tuple[int, int, float, float, float]
+
+
+class _Shard:
+    def __init__(
+        self,
+        qna_ids: List[int],
+        qna: List[QnA],
+        ref_questions_rows: np.ndarray,
+        similarity_metric: str,
+    ):
+        self.answers = {qna_id: group["a"] for qna_id, group in zip(qna_ids, qna)}
+        self.ref_questions = [question for group in qna for question in group["q"]]
+        self.ref_questions_idx = np.asarray(
+            [qna_id for qna_id, group in zip(qna_ids, qna) for _ in group["q"]]
+        )
+        self.ref_questions_rows = ref_questions_rows
+        self.similarity_metric = similarity_metric
+        self.ref_embeddings: Optional[csr_matrix] = None
+
+    def term_statistics(self, model) -> TermStatistics:
+        return term_statistics(model, self.ref_questions)
+
+    def fit(self, model) -> None:
+        # The reference questions are only needed to compute the embeddings
+        self.ref_embeddings = model.transform(self.ref_questions)
+        self.ref_questions = None
+
+    def query(self, input_embeddings: csr_matrix) -> ShardMatch:
+        similarities = QnABot._get_similarity_function(self.similarity_metric)(
+            input_embeddings, self.ref_embeddings
+        ).flatten()
+
+        # Cosine is a similarity, while the other metrics are distances
+        best_id = int(
+            np.argmax(similarities)
+            if self.similarity_metric == "cosine"
+            else np.argmin(similarities)
+        )
+        return (
+            int(self.ref_questions_idx[best_id]),
+            int(self.ref_questions_rows[best_id]),
+            float(similarities[best_id]),
+            float(similarities.min()),
+            float(similarities.max()),
+        )
+
+    def get_answers(self, qna_id: int) -> List[str]:
+        return self.answers[qna_id]
+
+
+def _serve_shard(shard: _Shard, authkey: bytes, address_conn) -> None:
+    with Listener(("localhost", 0), authkey=authkey) as listener:
+        address_conn.send(listener.address)
+        address_conn.close()
+
+        with listener.accept() as conn:
+            while True:
+                try:
+                    command, args = conn.recv()
+                except EOFError:
+                    break
+
+                if command == "close":
+                    break
+
+                try:
+                    conn.send(("ok", getattr(shard, command)(*args)))
+                except Exception as e:
+                    conn.send(("error", e))
+
+
+class _RemoteShard:
+    def __init__(self, shard: _Shard):
+        authkey = os.urandom(16)
+        address_conn, child_conn = Pipe(duplex=False)
+
+        self.process = Process(
+            target=_serve_shard, args=(shard, authkey, child_conn), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+        # Under spawn, a dead worker does not necessarily close its end of the pipe
+        while not address_conn.poll(0.1):
+            if not self.process.is_alive():
+                address_conn.close()
+                raise RuntimeError(
+                    "Shard worker process exited with code %s before serving"
+                    % self.process.exitcode
+                )
+        self.address = address_conn.recv()
+        address_conn.close()
+        self.conn = Client(self.address, authkey=authkey)
+
+    def send(self, command: str, args: tuple) -> None:
+        self.conn.send((command, args))
+
+    def recv(self) -> Tuple[str, Any]:
+        return self.conn.recv()
+
+    def close(self) -> None:
+        try:
+            self.conn.send(("close", ()))
+            self.conn.close()
+        except OSError:
+            pass
+        self.process.join()
+
+
+class ShardedQnABot:
+    _is_fitted: bool = False
+    _model_kwargs: dict = {}
+
+    def __init__(
+        self,
+        n_shards: int = 2,
+        model_name: Union[str, EmbeddingModel] = "tfidf",
+        similarity_metric: Union[str, SimilarityMetric] = "cosine",
+        min_score: float = 0.25,
+        cache: bool = False,
+        backend: Union[str, ShardBackend] = "local",
+        **kwargs
+    ) -> None:
+        """Initializes an instance of the ShardedQnABot class.
+
+        Args:
+            n_shards (int): Number of shards the reference questions of the knowledge base are partitioned into.
+                            Defaults to 2.
+            model_name (Union[str, EmbeddingModel]): Name of the model used for text embedding. Defaults to 'tfidf'.
+            similarity_metric (Union[str, SimilarityMetric]): Similarity metric used to find the most similar question.
+                                                              Defaults to 'cosine'.
+            min_score (float): Minimum similarity score below which an "I don't know" answer will be returned.
+                               Defaults to 0.25.
+            cache (bool): Whether the coordinator caches the entire knowledge base in memory. The shards always keep
+                          their own QnA groups in memory. Defaults to False.
+            backend (Union[str, ShardBackend]): Where the shards are served. 'local' keeps the shards in the current
+                                                process, and 'process' serves each shard by a separate worker process
+                                                over a localhost socket. Defaults to 'local'.
+            **kwargs: Other keyword arguments supported to initialize models.
+
+        """
+        self.n_shards: int = n_shards
+        self.model_name: str = model_name
+        self.similarity_metric: str = similarity_metric
+        self.min_score: float = min_score
+        self.cache: bool = cache
+        self.backend: str = backend
+
+        self._model_kwargs = kwargs
+        self._kb: Optional[QnAKnowledgeBase] = None
+        self._idk_answers: List[str] = []
+        self._model: Any = None
+        self._shards: List[Union[_Shard, _RemoteShard]] = []
+        self._lock: Optional[threading.Lock] = None
+
+    def fit(
+        self, kb: Union[FilePath, QnAKnowledgeBase] = DEFAULT_KNOWLEDGE_BASE_FILE_PATH
+    ):
+        """Fits the shards of the QnA Bot to a given knowledge base.
+
+        The QnA groups are assigned to the shards in a round-robin fashion. Each shard counts the terms of its own
+        reference questions, and only their document frequencies are merged into the embedding model, so that TF-IDF
+        statistics and scores are consistent across shards. Each shard then computes the embeddings of its reference
+        questions and keeps them along with the answers of its QnA groups.
+
+        The coordinator reads the knowledge base once to partition it, and then only keeps the fitted embedding model
+        and the "I don't know" answers, unless cache=True. A model with a fixed vocabulary, or a TF-IDF model with
+        use_idf=False, is fitted on all the reference questions in the coordinator instead.
+
+        Args:
+            kb (Union[FilePath, QnAKnowledgeBase]): Path to the knowledge base JSON file or buffer, or a
+                                                    QnAKnowledgeBase object. Defaults to the file path of the default
+                                                    QnA Bot knowledge base.
+
+        Returns:
+            self: The instance itself.
+        """
+        self.close()
+        check_value_error("backend", self.backend, [e.value for e in ShardBackend])
+        if not isinstance(self.n_shards, int) or self.n_shards < 1:
+            raise ValueError(
+                f"{self.n_shards} is not a valid n_shards. Must be a positive integer"
+            )
+        QnABot._get_similarity_function(self.similarity_metric)
+
+        self._kb = (
+            kb if isinstance(kb, QnAKnowledgeBase) else QnAKnowledgeBase(kb, self.cache)
+        )
+        self._idk_answers = self._kb.idk_answers
+        self._model = QnABot._initialize_model(
+            model_name=self.model_name, **self._model_kwargs
+        )
+        validate_model_params(self._model)
+
+        qna = self._kb.qna
+        fit_in_coordinator = not isinstance(self._model, HashingVectorizer) and (
+            self._model.vocabulary is not None
+            or (isinstance(self._model, TfidfVectorizer) and not self._model.use_idf)
+        )
+        if fit_in_coordinator:
+            self._model.fit([question for group in qna for question in group["q"]])
+
+        # Serializes the calls of concurrent callers on the shard connections
+        self._lock = threading.Lock()
+
+        self._shards = self._partition(qna)
+        del qna
+
+        if not (fit_in_coordinator or isinstance(self._model, HashingVectorizer)):
+            fit_term_statistics(self._model, self._gather("term_statistics", self._model))
+        self._gather("fit", self._model)
+
+        self._is_fitted = True
+        return self
+
+    def _partition(self, qna: List[QnA]) -> List[Union[_Shard, _RemoteShard]]:
+        first_rows = np.cumsum([0] + [len(group["q"]) for group in qna])
+        similarity_metric = str(SimilarityMetric(self.similarity_metric).value)
+
+        shards = []
+        for i in range(self.n_shards):
+            qna_ids = list(range(i, len(qna), self.n_shards))
+            if not qna_ids:
+                continue
+            shard = _Shard(
+                qna_ids,
+                [qna[qna_id] for qna_id in qna_ids],
+                np.concatenate(
+                    [np.arange(first_rows[j], first_rows[j + 1]) for j in qna_ids]
+                ),
+                similarity_metric,
+            )
+            shards.append(_RemoteShard(shard) if self.backend == "process" else shard)
+        return shards
+
+    def _gather(
+        self, command: str, *args, shards: Optional[list] = None
+    ) -> List[Any]:
+        shards = self._shards if shards is None else shards
+        if self.backend == "process":
+            # Scatter the command to all shards before waiting for any of them, and read every reply before raising
+            # an error so that no stale reply is left on a connection for the next call. The lock keeps the
+            # messages of concurrent calls from interleaving on the connections.
+            with self._lock:
+                for shard in shards:
+                    shard.send(command, args)
+                replies = [shard.recv() for shard in shards]
+            for status, result in replies:
+                if status == "error":
+                    raise result
+            return [result for _, result in replies]
+        else:
+            return [getattr(shard, command)(*args) for shard in shards]
+
+    def _best_match(self, input: str) -> Tuple[int, int, float]:
+        if not self._is_fitted:
+            raise NotFittedError(
+                "The model is not fitted. Use fit() method before calling answer()"
+            )
+
+        # Vectorize the input once and let the shards only score it
+        matches = self._gather("query", self._model.transform([input]))
+
+        if self.similarity_metric == "cosine":
+            # Highest similarity, breaking ties by the position in the knowledge base as a single QnABot does
+            shard_id = min(
+                range(len(matches)), key=lambda i: (-matches[i][2], matches[i][1])
+            )
+            return shard_id, matches[shard_id][0], matches[shard_id][2]
+
+        # Scale the lowest distance with the global minimum and maximum, as MinMaxScaler does on a single QnABot
+        shard_id = min(range(len(matches)), key=lambda i: (matches[i][2], matches[i][1]))
+        qna_id, _, distance, _, _ = matches[shard_id]
+        min_distance = min(m[3] for m in matches)
+        max_distance = max(m[4] for m in matches)
+        if max_distance == min_distance:
+            return shard_id, qna_id, 1.0
+        return (
+            shard_id,
+            qna_id,
+            1.0 - (distance - min_distance) / (max_distance - min_distance),
+        )
+
+    def find_similarity(self, input: str) -> Tuple[int, float]:
+        """Returns the index and similarity score of the question in the knowledge base most similar to the input.
+
+        Args:
+            input (str): Input question.
+
+        Returns:
+            int: Index of the most similar question.
+            float: Similarity score of the most similar question.
+        """
+        _, qna_id, score = self._best_match(input)
+        return qna_id, score
+
+    def answer(
+        self, input: str, return_score: bool = False
+    ) -> Union[str, Tuple[str, float]]:
+        """Returns one of the answers of the question in the knowledge base that is most similar to the input.
+
+        Args:
+            input (str): Input question.
+            return_score (bool): Whether to return the similarity score. Defaults to False.
+
+        Returns:
+            Union[str, Tuple[str, float]]: One of the answers of the most similar question in the knowledge base
+                                           if return_score=False, otherwise a tuple containing:
+                str: One of the answers of the most similar question in the knowledge base.
+                float: Similarity score.
+        """
+        shard_id, highest_id, score = self._best_match(input)
+
+        if score < self.min_score:
+            answer_ = np.random.choice(self._idk_answers)
+        else:
+            # The answers are kept by the shard of the QnA group
+            answers = self._gather(
+                "get_answers", highest_id, shards=[self._shards[shard_id]]
+            )[0]
+            answer_ = np.random.choice(answers)
+
+        if return_score:
+            return answer_, score
+        else:
+            return answer_
+
+    def close(self) -> None:
+        """Stops the worker processes serving the shards, if any.
+
+        """
+        for shard in self._shards:
+            if isinstance(shard, _RemoteShard):
+                shard.close()
+        self._shards = []
+        self._is_fitted = False
+
+    @property
+    def knowledge_base_(self) -> QnAKnowledgeBase:
+        """Returns the knowledge base on which the QnA Bot is fitted.
+
+        """
+        return self._kb
+
+    @property
+    def model_(self) -> Any:
+        """Returns the embedding model, whose vocabulary and IDF weights are merged from all the shards.
+
+        """
+        return self._model
+
+    @property
+    def n_shards_(self) -> int:
+        """Returns the number of non-empty shards.
+
+        """
+        return len(self._shards)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __repr__(self):
+        return (
+            "<ShardedQnABot(n_shards=%d, model_name='%s', similarity_metric='%s', min_score=%.2f, backend='%s')>"
+            % (
+                self.n_shards,
+                str(self.model_name),
+                str(self.similarity_metric),
+                self.min_score,
+                str(self.backend),
+            )
+        )
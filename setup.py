@@ -35,6 +35,7 @@ setup(
     ],
     python_requires=">=3.7",
     install_requires=["scikit-learn==1.0.2"],
+    entry_points={"console_scripts": ["qnabuilder=qnabuilder.cli:main"]},
     extras_require={
         "dev": ["streamlit==1.21.0", "pytest==7.3.1"],
         "editor": ["streamlit==1.21.0"],
@@ -0,0 +1,86 @@
+import io
+import json
+import os
+import tempfile
+from contextlib import redirect_stderr, redirect_stdout
+from unittest import TestCase
+
+from qnabuilder.cli import main
+
+
+class TestCLI(TestCase):
+    def run_cli(self, *argv) -> str:
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            self.assertEqual(main(list(argv)), 0)
+        return stdout.getvalue()
+
+    def test_answer_lines(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "questions.txt")
+            with open(path, "w") as file:
+                file.write("Who are you?\n\nSo what's your name?\n")
+
+            results = [json.loads(line) for line in self.run_cli("answer", "--batch-size", "1", path).splitlines()]
+        self.assertEqual([r["question"] for r in results], ["Who are you?", "So what's your name?"])
+        self.assertEqual([r["answer"] for r in results], ["I am QnA Builder!"] * 2)
+        self.assertEqual(results[0]["qna_id"], results[1]["qna_id"])
+
+    def test_save_and_answer_jsonl(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            bot_path = os.path.join(tmpdir, "bot.pkl")
+            summary = json.loads(self.run_cli("save", "--exact-match", "-o", bot_path))
+            self.assertEqual(summary["output"], bot_path)
+
+            path = os.path.join(tmpdir, "questions.jsonl")
+            with open(path, "w") as file:
+                for i, question in enumerate(["Who are you?", "Do you have a name?"] * 3):
+                    file.write(json.dumps({"id": i, "text": question}) + "\n")
+
+            argv = ["answer", "--bot", bot_path, "--format", "jsonl", "--field", "text", "--batch-size", "2"]
+            serial = self.run_cli(*argv, "--seed", "0", path)
+            parallel = self.run_cli(*argv, "--seed", "0", "--n-jobs", "2", path)
+        self.assertEqual(serial, parallel)
+        results = [json.loads(line) for line in serial.splitlines()]
+        self.assertEqual([r["id"] for r in results], list(range(6)))
+        self.assertTrue(all(r["answer"] == "I am QnA Builder!" for r in results))
+        self.assertEqual(results[0]["score"], 1.0)
+
+    def test_answer_malformed_jsonl(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "questions.jsonl")
+            with open(path, "w") as file:
+                file.write('{"id": 0, "text": "Who are you?"}\n{"id": 1\n{"id": 2}\n[3]\n{"id": 4, "text": "Hi"}\n')
+                file.write('{"id": 5, "text": null}\n{"id": 6, "text": 3}\n')
+
+            stderr = io.StringIO()
+            with redirect_stderr(stderr):
+                output = self.run_cli("answer", "--format", "jsonl", "--field", "text", path)
+            self.assertEqual([json.loads(line)["id"] for line in output.splitlines()], [0, 4])
+            self.assertIn("skipping line 2", stderr.getvalue())
+            self.assertIn("skipping line 3", stderr.getvalue())
+            self.assertIn("skipping line 4", stderr.getvalue())
+            self.assertIn("skipping line 6", stderr.getvalue())
+            self.assertIn("skipping line 7", stderr.getvalue())
+
+            with self.assertRaises(json.JSONDecodeError):
+                self.run_cli("answer", "--format", "jsonl", "--field", "text", "--strict", path)
+
+    def test_answer_overwritten_fields(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "questions.jsonl")
+            with open(path, "w") as file:
+                file.write('{"text": "Who are you?"}\n{"text": "Who are you?", "answer": "logged", "score": 0.5}\n')
+
+            stderr = io.StringIO()
+            with redirect_stderr(stderr):
+                output = self.run_cli("answer", "--format", "jsonl", "--field", "text", path)
+            self.assertEqual(len(output.splitlines()), 2)
+            self.assertIn("line 2", stderr.getvalue())
+            self.assertIn("['answer', 'score']", stderr.getvalue())
+            self.assertNotIn("line 1", stderr.getvalue())
+
+            with self.assertRaises(ValueError):
+                self.run_cli("answer", "--format", "jsonl", "--field", "text", "--strict", path)
+            with redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+                main(["answer", "--field", "answer", path])
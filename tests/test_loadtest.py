@@ -0,0 +1,41 @@
+import io
+import json
+from contextlib import redirect_stdout
+from unittest import TestCase
+
+from qnabuilder import QnABot
+from qnabuilder.loadtest import main, run_load_test, synthetic_queries
+
+
+class TestLoadTest(TestCase):
+    def test_synthetic_queries(self):
+        questions = ["q%d" % i for i in range(100)]
+        queries = synthetic_queries(questions, 1000, zipf=1.5, seed=0)
+        self.assertEqual(queries, synthetic_queries(questions, 1000, zipf=1.5, seed=0))
+        self.assertTrue(set(queries) <= set(questions))
+        # The most frequent question dominates a Zipf-distributed log
+        self.assertGreater(max(queries.count(q) for q in set(queries)), 200)
+
+    def test_run_load_test(self):
+        bot = QnABot(cache=True, exact_match=True).fit()
+        queries = synthetic_queries(bot.knowledge_base_.ref_questions, 50, noise=0.0, seed=0)
+        for mode in ["threads", "processes", "asyncio"]:
+            result = run_load_test(bot, queries, mode=mode, concurrency=2, sample_interval=0.01)
+            self.assertEqual(result["n_queries"], 50)
+            self.assertEqual(result["exact_hit_rate"], 1.0)
+            self.assertGreater(result["qps"], 0)
+            self.assertLessEqual(result["latency_ms"]["p50"], result["latency_ms"]["max"])
+
+    def test_main(self):
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            self.assertEqual(main(["--synthetic", "20", "--concurrency", "1", "--json"]), 0)
+        results = json.loads(stdout.getvalue())
+        self.assertEqual([(r["mode"], r["concurrency"], r["n_queries"]) for r in results], [("threads", 1, 20)])
+
+    def test_processes_throughput_excludes_pool_startup(self):
+        bot = QnABot(cache=True, exact_match=True).fit()
+        queries = synthetic_queries(bot.knowledge_base_.ref_questions, 200, noise=0.0, seed=0)
+        result = run_load_test(bot, queries, mode="processes", concurrency=1, sample_interval=0.01)
+        # With a single worker, throughput is bounded by the mean latency only if pool startup is not timed
+        self.assertGreater(result["qps"], 0.5 * 1000.0 / result["latency_ms"]["mean"])
@@ -1,6 +1,9 @@
+from concurrent.futures import ThreadPoolExecutor
 from unittest import TestCase
 
-from qnabuilder import QnABot, EmbeddingModel, SimilarityMetric
+import numpy as np
+
+from qnabuilder import QnABot, ShardedQnABot, EmbeddingModel, SimilarityMetric, MemoryBudgetExceededError
 
 
 class TestQnABot(TestCase):
@@ -34,3 +37,176 @@ class TestQnABot(TestCase):
             bot = QnABot(model_name=EmbeddingModel.COUNT, similarity_metric=metric)
             bot.fit()
             self.assertEqual(bot.answer("So what's your name?"), "I am QnA Builder!")
+
+    def test_exact_match(self):
+        bot = QnABot(exact_match=True)
+        bot.fit()
+        self.assertEqual(bot.answer("  WHO are you ", return_score=True), ("I am QnA Builder!", 1.0))
+        bot.answer("Tell me something about quantum chromodynamics")
+        self.assertEqual(bot.stats_["n_queries"], 2)
+        self.assertEqual(bot.stats_["n_exact_hits"], 1)
+        self.assertEqual(bot.stats_["exact_hit_rate"], 0.5)
+
+    def test_wrong_normalization_rule(self):
+        bot = QnABot(exact_match=True, normalization=["lowercase", "stemming"])
+        with self.assertRaises(ValueError) as ctx:
+            bot.fit()
+        self.assertIn("stemming is not a valid normalization rule", str(ctx.exception))
+
+    def test_compaction(self):
+        bot = QnABot(compact=True)
+        bot.fit()
+        report = bot.compaction_report_
+        self.assertEqual(bot.ref_embeddings_.shape[0], report["n_kept"])
+        self.assertEqual(report["n_rows"] - report["n_kept"], len(report["removed"]))
+        self.assertTrue(all(row["similarity"] == 1.0 for row in report["removed"]))
+        self.assertEqual(bot.answer("Who are you?"), "I am QnA Builder!")
+
+        bot = QnABot(compact=True, compact_threshold=0.9)
+        bot.fit()
+        self.assertLessEqual(bot.compaction_report_["n_kept"], report["n_kept"])
+        self.assertEqual(bot.answer("Who are you?"), "I am QnA Builder!")
+
+    def test_parallel_fit(self):
+        for model_name, kwargs in [("tfidf", {"min_df": 2}), ("count", {"max_features": 500}), ("murmurhash", {})]:
+            serial_embeddings = QnABot(model_name=model_name, **kwargs).fit().ref_embeddings_
+            bot = QnABot(model_name=model_name, n_jobs=2, **kwargs)
+            bot.fit()
+            self.assertEqual(bot.ref_embeddings_.shape, serial_embeddings.shape)
+            self.assertAlmostEqual(abs(bot.ref_embeddings_ - serial_embeddings).max(), 0.0)
+            self.assertEqual(bot.answer("Who are you?"), "I am QnA Builder!")
+
+    def test_parallel_fit_invalid_params(self):
+        for model_name, kwargs in [
+            ("tfidf", {"min_df": -1}),
+            ("tfidf", {"max_df": 1.5}),
+            ("count", {"ngram_range": (2, 1)}),
+            ("murmurhash", {"ngram_range": (2, 1)}),
+        ]:
+            for n_jobs in [None, 2]:
+                with self.assertRaises(ValueError):
+                    QnABot(model_name=model_name, n_jobs=n_jobs, **kwargs).fit()
+
+    def test_sharded_bot(self):
+        inputs = ["Who are you?", "Tell me a joke", "Do you love me?", "Happy Kwanzaa"]
+        for metric in SimilarityMetric:
+            expected = [QnABot(similarity_metric=metric).fit().find_similarity(x) for x in inputs]
+            for backend in ["local", "process"]:
+                with ShardedQnABot(n_shards=3, similarity_metric=metric, backend=backend) as bot:
+                    bot.fit()
+                    self.assertEqual(bot.n_shards_, 3)
+                    for (qna_id, score), (expected_id, expected_score) in zip(map(bot.find_similarity, inputs), expected):
+                        self.assertEqual(qna_id, expected_id)
+                        self.assertAlmostEqual(score, expected_score)
+                    self.assertEqual(bot.answer("Who are you?"), "I am QnA Builder!")
+
+    def test_sharded_bot_models(self):
+        inputs = ["Who are you?", "Tell me a joke", "Happy Kwanzaa"]
+        for model_name, kwargs in [
+            ("tfidf", {"min_df": 2, "sublinear_tf": True}),
+            ("tfidf", {"use_idf": False}),
+            ("tfidf", {"vocabulary": ["who", "are", "you", "joke"]}),
+            ("count", {"max_features": 500}),
+            ("murmurhash", {}),
+        ]:
+            expected = QnABot(model_name=model_name, **kwargs).fit().find_similarities(inputs)
+            bot = ShardedQnABot(n_shards=3, model_name=model_name, **kwargs).fit()
+            for (qna_id, score), (expected_id, expected_score) in zip(map(bot.find_similarity, inputs), expected):
+                self.assertEqual(qna_id, expected_id)
+                self.assertAlmostEqual(score, expected_score)
+
+    def test_wrong_shard_backend(self):
+        bot = ShardedQnABot(backend="kubernetes")
+        with self.assertRaises(ValueError) as ctx:
+            bot.fit()
+        self.assertIn("kubernetes is not a valid backend", str(ctx.exception))
+
+    def test_find_similarities(self):
+        inputs = ["Who are you?", "Tell me a joke", "Happy Kwanzaa", "quantum chromodynamics"]
+        for metric in SimilarityMetric:
+            bot = QnABot(similarity_metric=metric, exact_match=True)
+            bot.fit()
+            for (qna_id, score), input in zip(bot.find_similarities(inputs), inputs):
+                expected_id, expected_score = bot.find_similarity(input)
+                self.assertEqual(qna_id, expected_id)
+                self.assertAlmostEqual(score, expected_score)
+
+    def test_memory_usage(self):
+        # The parallel fit sets stop_words_ whatever the scikit-learn version
+        kwargs = dict(cache=True, exact_match=True, min_df=2, n_jobs=2)
+        bot = QnABot(**kwargs).fit()
+        self.assertTrue(bot.model_.stop_words_)
+        self.assertGreater(bot.memory_usage()["stop_words"], 0)
+
+        bot = QnABot(drop_unused_attributes=True, **kwargs)
+        bot.fit()
+        usage = bot.memory_usage()
+        self.assertFalse(hasattr(bot.model_, "stop_words_"))
+        self.assertEqual(usage["stop_words"], 0)
+        for component in ["vocabulary", "idf", "ref_embeddings", "exact_index", "knowledge_base"]:
+            self.assertGreater(usage[component], 0)
+        # The QnA IDs are shared with the knowledge base cache and counted once, under the knowledge base
+        self.assertEqual(usage["ref_questions_idx"], 0)
+        self.assertEqual(usage["total"], sum(v for k, v in usage.items() if k != "total"))
+
+        usage = QnABot().fit().memory_usage()
+        self.assertGreater(usage["ref_questions_idx"], 0)
+        self.assertEqual(usage["knowledge_base"], 0)
+
+    def test_memory_budget(self):
+        total = QnABot().fit().memory_usage()["total"]
+        with self.assertRaises(MemoryBudgetExceededError):
+            QnABot(memory_budget=total - 1).fit()
+
+        bot = QnABot(memory_budget=total - 1, memory_budget_action="compact")
+        bot.fit()
+        self.assertLess(bot.memory_usage()["total"], total)
+        self.assertEqual(bot.answer("Who are you?"), "I am QnA Builder!")
+
+        # The budget is checked after compaction, before the exact-match index is built
+        bot = QnABot(exact_match=True, memory_budget=total - 1)
+        with self.assertRaises(MemoryBudgetExceededError):
+            bot.fit()
+        self.assertIsNone(bot._params["exact_index"])
+
+        # A fitted bot whose memory usage equals the budget is accepted
+        total = QnABot(cache=True).fit().memory_usage()["total"]
+        QnABot(cache=True, memory_budget=total).fit()
+
+        # A compacted bot whose memory usage equals the budget is accepted
+        kwargs = dict(compact=True, compact_threshold=0.8, drop_unused_attributes=True)
+        total = QnABot(**kwargs).fit().memory_usage()["total"]
+        QnABot(memory_budget=total, **kwargs).fit()
+
+    def test_compaction_blocks(self):
+        from qnabuilder._compaction import _near_duplicate_rows
+
+        bot = QnABot().fit()
+        rows = np.arange(2000)
+        expected = _near_duplicate_rows(bot.ref_embeddings_, rows, 0.8, block_size=2000)
+        for block_size in [1, 7, 256]:
+            representative, scores = _near_duplicate_rows(bot.ref_embeddings_, rows, 0.8, block_size=block_size)
+            np.testing.assert_array_equal(representative, expected[0])
+            np.testing.assert_allclose(scores, expected[1])
+
+    def test_sharded_bot_recovers_from_shard_errors(self):
+        with ShardedQnABot(n_shards=3, backend="process") as bot:
+            bot.fit()
+            with self.assertRaises(AttributeError):
+                bot.find_similarity(None)
+            # Embeddings with a wrong number of features make every shard reply with an error
+            with self.assertRaises(ValueError):
+                bot._gather("query", bot.model_.transform(["Who are you?"])[:, :10])
+            self.assertEqual(bot.answer("Who are you?"), "I am QnA Builder!")
+            self.assertEqual(bot.find_similarity("Tell me a joke"), QnABot().fit().find_similarity("Tell me a joke"))
+
+    def test_sharded_bot_concurrent_queries(self):
+        inputs = ["Who are you?", "Tell me a joke", "Happy Kwanzaa", "quantum chromodynamics"] * 25
+        expected = QnABot().fit().find_similarities(inputs)
+        with ShardedQnABot(n_shards=3, backend="process") as bot:
+            bot.fit()
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = list(executor.map(bot.find_similarity, inputs))
+        for (qna_id, score), (expected_id, expected_score) in zip(results, expected):
+            self.assertEqual(qna_id, expected_id)
+            self.assertAlmostEqual(score, expected_score)